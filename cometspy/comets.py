@@ -11,11 +11,22 @@ any saved data (e.g. total_biomass) can be accessed from the object.
 
 import re
 import subprocess as sp
+import io
 import pandas as pd
 import os
 import glob
+import shutil
+import tempfile
+import functools
 import numpy as np
 import platform
+import warnings
+import weakref
+
+try:
+    import numba
+except ImportError:  # numba is optional; images are then built with numpy
+    numba = None
 
 __author__ = "Djordje Bajic, Jean Vila, Jeremy Chacon"
 __copyright__ = "Copyright 2019, The COMETS Consortium"
@@ -30,11 +41,197 @@ __email__ = "djordje.bajic@yale.edu"
 __status__ = "Beta"
 
 
-def _readlines_file(filename):
-    f = open(filename, 'r')
-    f_lines = f.readlines()
-    f.close()
-    return f_lines
+_MEDIA_LOG_DTYPES = {'metabolite': 'category', 'cycle': np.int32,
+                     'x': np.int16, 'y': np.int16, 'conc_mmol': np.float64}
+_BIOMASS_LOG_DTYPES = {'cycle': np.int32, 'x': np.int16, 'y': np.int16,
+                       'species': 'category', 'biomass': np.float64}
+# the model number is the fourth field of each line of the flux log
+_FLUX_LOG_MODEL_NUM = re.compile(rb'\s*\S+\s+\S+\s+\S+\s+(\d+)(?=\s|$)')
+
+
+def _read_log(filename, **kwargs):
+    """ reads a whitespace-delimited COMETS log with the C parser. If the
+    values cannot be parsed, the log is re-read assuming commas as decimals,
+    as written on some systems """
+    try:
+        return pd.read_csv(filename, sep=r'\s+', engine='c', **kwargs)
+    except ValueError:
+        if hasattr(filename, 'seek'):
+            filename.seek(0)
+        return pd.read_csv(filename, sep=r'\s+', engine='c', decimal=',',
+                           **kwargs)
+
+
+def _read_total_biomass(path, model_ids):
+    """ reads the total biomass log, with one column per model id """
+    total_biomass = _read_log(path, header=None,
+                              names=['cycle'] + model_ids,
+                              dtype=np.float64)
+    total_biomass.cycle = total_biomass.cycle.astype('int')
+    return(total_biomass)
+
+
+def _read_media(path):
+    """ reads the spatially-explicit media log """
+    return(_read_log(path, names=list(_MEDIA_LOG_DTYPES),
+                     dtype=_MEDIA_LOG_DTYPES, memory_map=True))
+
+
+def _read_biomass(path):
+    """ reads the spatially-explicit biomass log """
+    biomass = _read_log(path, header=None, names=list(_BIOMASS_LOG_DTYPES),
+                        dtype=_BIOMASS_LOG_DTYPES)
+    # cut off extension added by toolbox
+    biomass['species'] = biomass['species'].cat.rename_categories(
+        lambda sp: sp[:-4] if '.cmd' in sp else sp)
+    return(biomass)
+
+
+def _read_genotypes(path):
+    """ reads the genotypes log written by evolution simulations """
+    return(pd.read_csv(path, header=None, delimiter=r'\s+',
+                       names=['Ancestor', 'Mutation', 'Species']))
+
+
+def _read_specific_media(path):
+    """ reads the specific media log """
+    specific_media = pd.read_csv(path, delimiter=r'\s+')
+    # deal with commas-as-decimals
+    if any([isinstance(specific_media.iloc[0,i], str) for i in range(3, specific_media.shape[1])]):
+        specific_media = pd.read_csv(path, decimal = ",",delimiter=r'\s+')
+    return(specific_media)
+
+
+def _read_fluxes_by_species(flux_file, models):
+    """ the flux log is an odd beast, where the column position has a
+    different meaning depending on what model the row is about. Therefore,
+    this function splits the rows by model number and parses each model's
+    rows into a separate dataframe, returned in a dictionary with model_id
+    as a key, that is much more human-readable."""
+
+    # group the lines by model number in a single pass over the log
+    lines_by_model = {}
+    with open(flux_file, 'rb') as f:
+        for line in f:
+            model_num = _FLUX_LOG_MODEL_NUM.match(line)
+            if model_num is not None:
+                lines_by_model.setdefault(int(model_num.group(1)), []).append(line)
+
+    fluxes_by_species = {}
+    for model_num, model in enumerate(models, start=1):
+        model_id = model.id
+        model_rxn_names = list(model.reactions.REACTION_NAMES)
+        model_rxn_len = len(model_rxn_names)
+
+        # read only this model's columns, skipping the model num column
+        names = ["cycle", "x", "y"] + model_rxn_names
+        dtypes = dict.fromkeys(model_rxn_names, np.float64)
+        dtypes.update({"cycle": np.int32, "x": np.int16, "y": np.int16})
+        model_lines = lines_by_model.pop(model_num, [])
+        if len(model_lines) == 0:
+            sub_df = pd.DataFrame({name: pd.Series(dtype=dtype)
+                                   for name, dtype in dtypes.items()},
+                                  columns=names)
+        else:
+            model_lines = b''.join(model_lines)
+            sub_df = _read_log(io.BytesIO(model_lines),
+                               header=None, names=names,
+                               usecols=[0, 1, 2] + list(range(4, 4 + model_rxn_len)),
+                               dtype=dtypes)
+        fluxes_by_species[model_id] = sub_df
+    return(fluxes_by_species)
+
+
+def _log_image(log, rows, column, grid, out=None):
+    """ returns a 2d array of the size of grid, with the values of column in
+    the given rows of a log placed at their (1-based) x, y locations. If out
+    is given, it is zeroed and used as the array """
+    if out is None:
+        im = np.zeros((grid[0], grid[1]))
+    elif out.shape != (grid[0], grid[1]):
+        raise ValueError("out must have the shape of layout.grid")
+    elif not np.issubdtype(out.dtype, np.floating):
+        raise ValueError("out must have a floating point dtype")
+    else:
+        im = out
+        im.fill(0)
+    if len(rows) and (rows.min() < 0 or rows.max() >= len(log)):
+        raise ValueError("log rows are out of range; was the log changed in place?")
+    # x and y may be floats or objects in a frame assigned by the user
+    xs = log['x'].to_numpy()[rows].astype(np.intp)
+    ys = log['y'].to_numpy()[rows].astype(np.intp)
+    if len(rows) and (xs.min() < 1 or xs.max() > grid[0]
+                      or ys.min() < 1 or ys.max() > grid[1]):
+        raise ValueError("log x, y locations are outside of layout.grid")
+    vs = log[column].to_numpy()[rows]
+    # the compiled kernel only takes numeric values
+    if numba is not None and vs.dtype.kind in 'biuf':
+        _scatter(im, xs, ys, vs)
+    else:
+        im[xs - 1, ys - 1] = vs
+    return(im)
+
+
+def _scatter(im, xs, ys, vs):
+    """ sets im[xs[i] - 1, ys[i] - 1] = vs[i] for each i. Compiled with
+    numba when it is installed, so it does no bounds checks: _log_image
+    validates xs and ys first """
+    for i in range(len(xs)):
+        im[xs[i] - 1, ys[i] - 1] = vs[i]
+
+
+if numba is not None:
+    _scatter = numba.njit(cache=True)(_scatter)
+
+
+# java libraries COMETS depends on: (library name, glob pattern relative to
+# COMETS_HOME/lib, substrings excluding a match), in classpath order
+_CP_LIBRARIES = (
+    ('junit', ('junit', '**', '*junit*'), ()),
+    ('hamcrest', ('**', '*hamcrest*'), ()),
+    ('jogl_all', ('**', 'jogl-all.jar'), ()),
+    ('gluegen_rt', ('**', 'gluegen-rt.jar'), ()),
+    ('gluegen', ('**', 'gluegen.jar'), ()),
+    ('gluegen_rt_natives', ('**', 'gluegen-rt-natives-linux-amd64.jar'), ()),
+    ('jogl_all_natives', ('**', 'jogl-all-natives-linux-amd64.jar'), ()),
+    ('jmatio', ('**', 'jamtio.jar'), ()),
+    ('jmat', ('**', 'jmatio.jar'), ()),
+    ('concurrent', ('**', 'concurrent.jar'), ()),
+    ('colt', ('**', 'colt.jar'), ()),
+    ('lang3', ('**', 'commons-lang3*jar'), ('test', 'sources')),
+    ('math3', ('**', 'commons-math3*jar'),
+     ('test', 'sources', 'tools', 'javadoc')),
+    ('jdistlib', ('**', '*jdistlib*'), ()),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _find_comets_libraries(comets_home):
+    """ returns a tuple of (library name, path) for each library in
+    _CP_LIBRARIES, searching under comets_home/lib. The search is only done
+    once per comets_home """
+    lib_dir = os.path.join(comets_home, 'lib')
+    libraries = []
+    for name, pattern, excluded in _CP_LIBRARIES:
+        matches = glob.glob(os.path.join(lib_dir, *pattern), recursive=True)
+        libraries.append((name, [m for m in matches
+                                 if not any(e in m for e in excluded)][0]))
+    return tuple(libraries)
+
+
+# classpath files found on disk; these are not expected to disappear while
+# python runs, so each is only checked once
+_found_files = set()
+
+
+def _is_file(path):
+    """ os.path.isfile, remembering the files that were found """
+    if path in _found_files:
+        return True
+    if os.path.isfile(path):
+        _found_files.add(path)
+        return True
+    return False
 
 
 class comets:
@@ -80,7 +277,9 @@ class comets:
     classpath_pieces : dict
         classpath separated into library name (key) and location (value)
     JAVA_CLASSPATH : str
-        a generated (overwritable) string containing the java classpath
+        a generated (overwritable) string containing the java classpath.
+        COMETS runs in a subdirectory of working_dir, so any paths set here
+        should be absolute
     run_output : str
         generated object containing text from COMETS sim's std_out
     run_errors : str
@@ -95,6 +294,8 @@ class comets:
         generated object containing spatially-explicit media from sim
     fluxes_by_species : dict{model_id : pandas.DataFrame}
         generated object containing each species' spatial-explicit fluxes
+    fluxes : pandas.DataFrame
+        deprecated; all species' fluxes in one frame, use fluxes_by_species
     genotypes : pandas.DataFrame
         generated object containing genotypes if an evolution sim was run
 
@@ -117,9 +318,21 @@ class comets:
 
     """
 
+    # classpaths whose pieces were all found, so need not be checked again
+    _classpath_validated = set()
+
     def __init__(self, layout,
                  parameters, relative_dir : str =''):
 
+        # unique id appended to the names of this object's files
+        self._uid = hex(id(self))
+
+        # simulation files and logs of the last run; see run() and close()
+        self._sim_dir = None
+        self._cleanup = None
+        self._log_files = {}
+        self._logs = {}
+
         # define instance variables
         self.working_dir = os.getcwd() + '/' + relative_dir
         try:
@@ -156,93 +369,44 @@ class comets:
         # dealing with output files
         self.parameters.set_param("useLogNameTimeStamp", False)
         self.parameters.set_param("TotalBiomassLogName",
-                                  self.parameters.all_params['TotalBiomassLogName'] + '_' + hex(id(self)))
+                                  self.parameters.all_params['TotalBiomassLogName'] + '_' + self._uid)
         self.parameters.set_param("BiomassLogName",
-                                  self.parameters.all_params['BiomassLogName'] + '_' + hex(id(self)))
+                                  self.parameters.all_params['BiomassLogName'] + '_' + self._uid)
         self.parameters.set_param("FluxLogName",
-                                  self.parameters.all_params['FluxLogName'] + '_' + hex(id(self)))
+                                  self.parameters.all_params['FluxLogName'] + '_' + self._uid)
         self.parameters.set_param("MediaLogName",
-                                  self.parameters.all_params['MediaLogName'] + '_' + hex(id(self)))
+                                  self.parameters.all_params['MediaLogName'] + '_' + self._uid)
+
+        # row positions of each cycle in each log, built lazily by the
+        # get_*_image methods
+        self.__reset_row_caches()
+
+    def __reset_row_caches(self):
+        """ invalidates the cached row positions of each cycle in each log """
+        self._media_rows = None
+        self._biomass_rows = None
+        self._flux_rows = {}
 
     def __build_default_classpath_pieces(self):
         """
-        sets up what it thinks the classpath should be
+        sets up what it thinks the classpath should be. Paths are made
+        absolute, because COMETS runs inside the simulation directory
         """
+        comets_home = os.path.abspath(self.COMETS_HOME)
         self.classpath_pieces = {}
-        self.classpath_pieces['gurobi'] = (self.GUROBI_HOME +
-                                           '/lib/gurobi.jar')
-
-        self.classpath_pieces['junit'] = glob.glob(self.COMETS_HOME +
-                                                   '/lib/junit' + '/**/*junit*',
-                                                   recursive=True)[0]
-        self.classpath_pieces['hamcrest'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/*hamcrest*',
-                                                      recursive=True)[0]
-
-        self.classpath_pieces['jogl_all'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/jogl-all.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['gluegen_rt'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/gluegen-rt.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['gluegen'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/gluegen.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['gluegen_rt_natives'] = glob.glob(
-            self.COMETS_HOME + '/lib' + '/**/gluegen-rt-natives-linux-amd64.jar',
-            recursive=True)[0]
-        self.classpath_pieces['jogl_all_natives'] = glob.glob(
-            self.COMETS_HOME + '/lib' + '/**/jogl-all-natives-linux-amd64.jar',
-            recursive=True)[0]
-
-        self.classpath_pieces['jmatio'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/jamtio.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['jmat'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/jmatio.jar',
-                                                      recursive=True)[0]
-
-        self.classpath_pieces['concurrent'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/concurrent.jar',
-                                                      recursive=True)[0]
-        self.classpath_pieces['colt'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/colt.jar',
-                                                      recursive=True)[0]
-
-        __lang3 = glob.glob(self.COMETS_HOME +
-                            '/lib' + '/**/commons-lang3*jar',
-                            recursive=True)
-        self.classpath_pieces['lang3'] = [i for i in __lang3
-                                          if 'test' not in i
-                                          and 'sources' not in i][0]
-
-        __math3 = glob.glob(self.COMETS_HOME +
-                            '/lib' + '/**/commons-math3*jar',
-                            recursive=True)
-        self.classpath_pieces['math3'] = [i for i in __math3
-                                          if 'test' not in i
-                                          and 'sources' not in i
-                                          and 'tools' not in i
-                                          and 'javadoc' not in i][0]
-
-        self.classpath_pieces['jdistlib'] = glob.glob(self.COMETS_HOME +
-                                                      '/lib' + '/**/*jdistlib*',
-                                                      recursive=True)[0]
-        self.classpath_pieces['bin'] = (self.COMETS_HOME +
-                                        '/bin/' + self.VERSION + '.jar')
-
+        self.classpath_pieces['gurobi'] = os.path.abspath(
+            os.path.join(self.GUROBI_HOME, 'lib', 'gurobi.jar'))
+        self.classpath_pieces.update(_find_comets_libraries(comets_home))
+        self.classpath_pieces['bin'] = os.path.join(comets_home, 'bin',
+                                                    self.VERSION + '.jar')
 
     def __build_and_set_classpath(self):
         ''' builds the JAVA_CLASSPATH from the pieces currently in
         self.classpath_pieces '''
-        paths = list(self.classpath_pieces.values())
+        classpath = os.pathsep.join(self.classpath_pieces.values())
         if platform.system() == 'Windows':
-            classpath = ';'.join(paths)
             classpath = '\"' + classpath + '\"'
             self.JAVA_LIB = '\"' + self.GUROBI_HOME + '/lib;' + self.GUROBI_HOME+ '/bin;'+ self.COMETS_HOME+ '/lib/jogl/jogamp-all-platforms/lib'+ '\"'
-
-        else:
-            classpath = ':'.join(paths)
         self.JAVA_CLASSPATH = classpath
 
     def __test_classpath_pieces(self):
@@ -252,9 +416,12 @@ class comets:
         or just set the classpath directly'''
         if platform.system() == 'Windows':
             return # Windows uses the script, so classpath doesn't matter as long as env variable set
+        if self.JAVA_CLASSPATH in comets._classpath_validated:
+            return
         broken_pieces = self.__get_broken_classpath_pieces()
         if len(broken_pieces) == 0:
-            pass  # yay! class files are where we hoped
+            # yay! class files are where we hoped
+            comets._classpath_validated.add(self.JAVA_CLASSPATH)
         else:
             print('Warning: java class libraries cannot be found')
             print('These are the expected locations for dependencies:')
@@ -285,7 +452,7 @@ class comets:
 
         broken_pieces = {}         #
         for key, value in self.classpath_pieces.items():
-            if not os.path.isfile(value):  #
+            if not _is_file(value):  #
                 broken_pieces[key] = value
         return(broken_pieces)
 
@@ -312,7 +479,7 @@ class comets:
         >>> sim.set_classpath("jmatio", "/opt/jmatio/jmatio.jar")
 
         """
-        self.classpath_pieces[libraryname] = path
+        self.classpath_pieces[libraryname] = os.path.abspath(path)
         self.__build_and_set_classpath()
 
     def run(self, delete_files : bool = True):
@@ -328,8 +495,18 @@ class comets:
         simulation logs including data, as well as the std_out in the
         run_output attribute.
 
-        If the optional delete_files is set to False, then temporary files and
-        data log files are not deleted. They are deleted by default.
+        Temporary files and data log files are written to a directory named
+        .comets_<id> within the working directory. Each log is only read
+        when its attribute (e.g. total_biomass) is first accessed. If the
+        optional delete_files is set to False, then this directory is not
+        deleted. By default, it is deleted once all logs have been read, or
+        when close() is called.
+
+        Note that logs which are never read stay on disk until then. If only
+        some logs are needed (e.g. total_biomass in a parameter sweep that
+        keeps many comets objects), call close() after reading them so that
+        the other logs, such as the often large media and flux logs, are
+        removed right away.
 
         Parameters
         ----------
@@ -344,196 +521,228 @@ class comets:
         >>> sim.run(delete_files = True)
         >>> print(sim.run_output)
         >>> print(sim.total_biomass)
+        >>> sim.close() # remove the logs that were not read
 
         """
         print('\nRunning COMETS simulation ...')
+        # discard the logs of any previous run
+        self.close()
+        self._logs = {}
+        self.__reset_row_caches()
 
         # If evolution is true, write the biomass but not the total biomass log
         if self.parameters.all_params['evolution']:
             self.parameters.all_params['writeTotalBiomassLog'] = False
             self.parameters.all_params['writeBiomassLog'] = True
 
-        to_append = '_' + hex(id(self))
-        # write the files for comets in working_dir
-        c_global = self.working_dir + '.current_global' + to_append
-        c_package = self.working_dir + '.current_package' + to_append
-        c_script = self.working_dir + '.current_script' + to_append
+        to_append = '_' + self._uid
+        # write the files for comets in their own directory within working_dir,
+        # so that they can all be removed at once
+        sim_dir = self.working_dir + '.comets' + to_append + '/'
+        os.makedirs(sim_dir, exist_ok=True)
+        c_global = sim_dir + '.current_global' + to_append
+        c_package = sim_dir + '.current_package' + to_append
+        c_script = sim_dir + '.current_script' + to_append
 
-        self.layout.write_necessary_files(self.working_dir, to_append)
+        self.layout.write_necessary_files(sim_dir, to_append)
 
-        # self.layout.write_layout(self.working_dir + '.current_layout')
+        # self.layout.write_layout(sim_dir + '.current_layout')
         self.parameters.write_params(c_global, c_package)
 
-        if os.path.isfile(c_script):
-            os.remove(c_script)
-        with open(c_script, 'a') as f:
-            f.write('load_comets_parameters ' + '.current_global' + to_append + '\n')
-            f.writelines('load_package_parameters ' + '.current_package' + to_append + '\n')
-            f.writelines('load_layout ' + '.current_layout' + to_append)
+        with open(c_script, 'w') as f:
+            f.write(f'load_comets_parameters .current_global{to_append}\n'
+                    f'load_package_parameters .current_package{to_append}\n'
+                    f'load_layout .current_layout{to_append}')
 
         if platform.system() == 'Windows':
-            self.cmd = ('\"' + self.COMETS_HOME +
-                        '\\comets_scr' + '\" \"' +
-                        c_script +
-                        '\"')
+            # comets_scr is a batch script, which needs cmd.exe to run
+            self.cmd = [os.path.join(os.path.abspath(self.COMETS_HOME), 'comets_scr'),
+                        c_script]
+            use_shell = True
         else:
             # simulate
-            self.cmd = ('java -classpath ' + self.JAVA_CLASSPATH +
-                        # ' -Djava.library.path=' + self.D_JAVA_LIB_PATH +
-                        ' edu.bu.segrelab.comets.Comets -loader' +
-                        ' edu.bu.segrelab.comets.fba.FBACometsLoader' +
-                        ' -script "' + c_script + '"')
-
-        p = sp.Popen(self.cmd,
-                     cwd = self.working_dir,
-                     shell=True, stdout=sp.PIPE, stderr=sp.STDOUT)
-
-        self.run_output, self.run_errors = p.communicate()
-        self.run_output = self.run_output.decode()
-
-        if self.run_errors is not None:
-            self.run_errors = self.run_errors.decode()
-        else:
+            self.cmd = ['java', '-classpath', self.JAVA_CLASSPATH,
+                        # '-Djava.library.path=' + self.D_JAVA_LIB_PATH,
+                        'edu.bu.segrelab.comets.Comets',
+                        '-loader', 'edu.bu.segrelab.comets.fba.FBACometsLoader',
+                        '-script', c_script]
+            use_shell = False
+
+        # std_err goes to a file so that a full pipe cannot block COMETS
+        # while std_out is being read
+        with tempfile.TemporaryFile() as std_err:
+            p = sp.Popen(self.cmd,
+                         cwd = sim_dir,
+                         shell=use_shell, stdout=sp.PIPE, stderr=std_err)
+
+            # std_out is kept as bytes and only decoded if run_output is
+            # accessed
+            self._run_output_bytes = p.stdout.read()
+            p.stdout.close()
+            p.wait()
+
+            std_err.seek(0)
+            self.run_errors = std_err.read().decode()
+        if not self.run_errors:
             self.run_errors = "STDERR empty."
 
         # Raise RuntimeError if simulation had nonzero exit
-        self.__analyze_run_output()
+        self.__analyze_run_output(p.returncode)
+        self._sim_dir = sim_dir
+        # the files belong to this object, not to copies of it, and are
+        # removed by close() or when it is garbage collected
+        if delete_files:
+            self._cleanup = weakref.finalize(self, shutil.rmtree, sim_dir,
+                                             ignore_errors=True)
 
         # '''----------- READ OUTPUT ---------------------------------------'''
-        # Read total biomass output
-        if self.parameters.all_params['writeTotalBiomassLog']:
-            tbmf = _readlines_file(
-                self.working_dir + self.parameters.all_params['TotalBiomassLogName'])
-            tbmf = [x.replace(",",".") for x in tbmf] # for systems that use commas as decimal place
-            self.total_biomass = pd.DataFrame([re.split(r'\t+', x.strip())
-                                               for x in tbmf],
-                                              columns=['cycle'] +
-                                              self.layout.get_model_ids())
-            self.total_biomass = self.total_biomass.astype('float')
-            self.total_biomass.cycle = self.total_biomass.cycle.astype('int')
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['TotalBiomassLogName'])
-
-        # Read flux
-        if self.parameters.all_params['writeFluxLog']:
-
-            max_rows = 4 + max([len(m.reactions) for m in self.layout.models])
-
-            self.fluxes = pd.read_csv(self.working_dir + self.parameters.all_params['FluxLogName'],
-                                      delim_whitespace=True,
-                                      header=None, names=range(max_rows))
-            # deal with commas-as-decimals
-            if any([isinstance(self.fluxes.iloc[0,i], str) for i in range(self.fluxes.shape[1])]):
-                self.fluxes = pd.read_csv(self.working_dir + self.parameters.all_params['FluxLogName'],
-                                      decimal = ",", delim_whitespace=True,
-                                      header=None, names=range(max_rows))
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['FluxLogName'])
-            self.__build_readable_flux_object()
-
-        # Read media logs
-        if self.parameters.all_params['writeMediaLog']:
-            self.media = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'MediaLogName'], delim_whitespace=True, names=('metabolite',
-                                                               'cycle', 'x',
-                                                               'y',
-                                                               'conc_mmol'))
-            # deal with commas-as-decimals
-            if isinstance(self.media.loc[0, "conc_mmol"], str):
-                self.media = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'MediaLogName'],
-                    decimal = ",", delim_whitespace=True, names=('metabolite',
-                                                               'cycle', 'x',
-                                                               'y',
-                                                               'conc_mmol'))
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['MediaLogName'])
-
-        # Read spatial biomass log
-        if self.parameters.all_params['writeBiomassLog']:
-            self.biomass = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'BiomassLogName'], header=None, delimiter=r'\s+', names=['cycle', 'x', 'y',
-                                                                         'species', 'biomass'])
-            # deal with commas-as-decimals
-            if isinstance(self.biomass.loc[0,"biomass"], str):
-                self.biomass = pd.read_csv(self.working_dir + self.parameters.all_params[
-                'BiomassLogName'], header=None,
-                    decimal = ",",
-                    delimiter=r'\s+', names=['cycle', 'x', 'y','species', 'biomass'])
-
-            # cut off extension added by toolbox
-            self.biomass['species'] = [sp[:-4] if '.cmd' in sp else sp for sp in self.biomass.species]
-
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['BiomassLogName'])
-
-        # Read evolution-related logs
-        if 'evolution' in list(self.parameters.all_params.keys()):
-            if self.parameters.all_params['evolution']:
-                genotypes_out_file = 'GENOTYPES_' + self.parameters.all_params[
-                    'BiomassLogName']
-                self.genotypes = pd.read_csv(genotypes_out_file,
-                                             header=None, delimiter=r'\s+',
-                                             names=['Ancestor',
-                                                    'Mutation',
-                                                    'Species'])
-                if delete_files:
-                    os.remove(self.working_dir + genotypes_out_file)
-
-        # Read specific media output
-        if self.parameters.all_params['writeSpecificMediaLog']:
-            spec_med_file = self.working_dir + self.parameters.all_params['SpecificMediaLogName']
-            self.specific_media = pd.read_csv(spec_med_file, delimiter=r'\s+')
-            # deal with commas-as-decimals
-            if any([isinstance(self.specific_media.iloc[0,i], str) for i in range(3, self.specific_media.shape[1])]):
-                self.specific_media = pd.read_csv(spec_med_file, decimal = ",",delimiter=r'\s+')
-
-            if delete_files:
-                os.remove(self.working_dir + self.parameters.all_params['SpecificMediaLogName'])
+        # logs are only read when their attribute is first accessed. The
+        # simulation directory is removed once all of them have been read.
+        # Readers are module functions, not bound methods, so that this
+        # object is not part of a reference cycle and is freed (and its
+        # files removed) as soon as it is deleted
+        params = self.parameters.all_params
+        if params['writeTotalBiomassLog']:
+            self._log_files['total_biomass'] = (
+                _read_total_biomass,
+                (sim_dir + params['TotalBiomassLogName'],
+                 self.layout.get_model_ids()))
+        if params['writeFluxLog']:
+            self._log_files['fluxes_by_species'] = (
+                _read_fluxes_by_species,
+                (sim_dir + params['FluxLogName'], list(self.layout.models)))
+        if params['writeMediaLog']:
+            self._log_files['media'] = (
+                _read_media, (sim_dir + params['MediaLogName'],))
+        if params['writeBiomassLog']:
+            self._log_files['biomass'] = (
+                _read_biomass, (sim_dir + params['BiomassLogName'],))
+        if 'evolution' in list(params.keys()) and params['evolution']:
+            self._log_files['genotypes'] = (
+                _read_genotypes,
+                (sim_dir + 'GENOTYPES_' + params['BiomassLogName'],))
+        if params['writeSpecificMediaLog']:
+            self._log_files['specific_media'] = (
+                _read_specific_media,
+                (sim_dir + params['SpecificMediaLogName'],))
 
         # clean workspace
-        if delete_files:
-            self.layout.delete_model_files(self.working_dir)
-            os.remove(c_global)
-            os.remove(c_package)
-            os.remove(c_script)
-            os.remove(self.working_dir + '.current_layout' + to_append)
-            os.remove(self.working_dir + 'COMETS_manifest.txt')  # todo: stop writing this in java
+        if not self._log_files:
+            self.close()
         print('Done!')
 
-    def __build_readable_flux_object(self):
-        """ comets.fluxes is an odd beast, where the column position has a
-        different meaning depending on what model the row is about. Therefore,
-        this function creates separate dataframes, stored in a dictionary with
-        model_id as a key, that are much more human-readable."""
+    def close(self):
+        """
+        removes the files of the last simulation
 
-        self.fluxes_by_species = {}
-        for i in range(len(self.layout.models)):
-            model_num = i + 1
+        Logs that have not been accessed yet are discarded. This is called
+        automatically once every log of the last run has been read, and when
+        the comets object that ran the simulation is garbage collected.
+        Files are kept if run() was called with delete_files = False.
 
-            model_id = self.layout.models[model_num - 1].id
-            model_rxn_names = list(self.layout.models[
-                model_num - 1].reactions.REACTION_NAMES)
-            model_rxn_len = len(model_rxn_names)
+        Pickling or copying a comets object (e.g. returning it from a
+        multiprocessing worker) first reads all of its pending logs, so the
+        copy does not depend on these files.
 
-            sub_df = self.fluxes.loc[self.fluxes[3] == model_num]
+        Examples
+        --------
 
-            # this tosses extraneous columns and the model num column
-            sub_df = sub_df.drop(sub_df.columns[model_rxn_len+4: len(sub_df.columns)],
-                                 axis=1)
-            sub_df = sub_df.drop(sub_df.columns[3], axis=1)
-            sub_df.columns = ["cycle", "x", "y"] + model_rxn_names
-            self.fluxes_by_species[model_id] = sub_df
+        >>> sim.run()
+        >>> biomass = sim.total_biomass
+        >>> sim.close() # the other logs are not needed
 
-    def __analyze_run_output(self):
-        if "End of simulation" in self.run_output:
+        """
+        self._log_files = {}
+        if self._cleanup is not None:
+            self._cleanup()
+        self._cleanup = None
+        self._sim_dir = None
+
+    def __getstate__(self):
+        # pending logs are read first: the simulation files are removed
+        # with this object, so a pickled or copied comets object must not
+        # depend on them
+        for name in list(self._log_files):
+            self._load_log(name)
+        state = self.__dict__.copy()
+        state['_logs'] = dict(self._logs)
+        for key in ('_sim_dir', '_cleanup', '_log_files',
+                    '_media_rows', '_biomass_rows', '_flux_rows'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._sim_dir = None
+        self._cleanup = None
+        self._log_files = {}
+        self.__reset_row_caches()
+
+    @property
+    def run_output(self):
+        return self._run_output_bytes.decode()
+
+    @property
+    def fluxes(self):
+        """ deprecated: the flux log as a single frame, where column 3 is the
+        model number and later columns are that model's fluxes. Rebuilt from
+        fluxes_by_species, which should be used instead """
+        warnings.warn("comets.fluxes is deprecated and will be removed; "
+                      "use comets.fluxes_by_species instead",
+                      DeprecationWarning, stacklevel=2)
+        frames = []
+        for model_num, sub_df in enumerate(self.fluxes_by_species.values(), start=1):
+            sub_df = sub_df.copy()
+            sub_df.columns = [0, 1, 2] + list(range(4, sub_df.shape[1] + 1))
+            sub_df.insert(3, 3, model_num)
+            frames.append(sub_df)
+        fluxes = pd.concat(frames, ignore_index=True)
+        fluxes = fluxes.sort_values(0, kind='stable', ignore_index=True)
+        return(fluxes.reindex(columns=range(max(fluxes.columns) + 1)))
+
+    def _load_log(self, name):
+        """ returns the named log, reading it from file on first access """
+        if name not in self._logs:
+            if name not in self._log_files:
+                raise AttributeError(f"'comets' object has no attribute '{name}'")
+            reader, args = self._log_files[name]
+            self._logs[name] = reader(*args)
+            # only forget the file once it was read, so a failed read can
+            # be retried
+            del self._log_files[name]
+            if not self._log_files:
+                self.close()
+        return self._logs[name]
+
+    def _set_log(self, name, value):
+        """ replaces the named log, e.g. when a user assigns sim.media """
+        self._log_files.pop(name, None)
+        self._logs[name] = value
+        self.__reset_row_caches()
+
+    total_biomass = property(lambda self: self._load_log('total_biomass'),
+                             lambda self, value: self._set_log('total_biomass', value))
+    fluxes_by_species = property(lambda self: self._load_log('fluxes_by_species'),
+                                 lambda self, value: self._set_log('fluxes_by_species', value))
+    media = property(lambda self: self._load_log('media'),
+                     lambda self, value: self._set_log('media', value))
+    biomass = property(lambda self: self._load_log('biomass'),
+                       lambda self, value: self._set_log('biomass', value))
+    genotypes = property(lambda self: self._load_log('genotypes'),
+                         lambda self, value: self._set_log('genotypes', value))
+    specific_media = property(lambda self: self._load_log('specific_media'),
+                              lambda self, value: self._set_log('specific_media', value))
+
+    def __analyze_run_output(self, returncode):
+        if returncode == 0 and b"End of simulation" in self._run_output_bytes:
             return
         else:
             print("Error: COMETS simulation did not complete\n")
-            print("     examine comets.run_output for the full java trace\n")
+            print(self.run_errors)
+            print("     examine comets.run_output and comets.run_errors for the full java trace\n")
             print("     if we detect a common reason, it will be stated in the RuntimeError at the bottom")
 
-            if "Could not find or load main class edu.bu.segrelab.comets.Comets" in self.run_output:
+            if "Could not find or load main class edu.bu.segrelab.comets.Comets" in self.run_errors:
                 message = "Could not find or load main class edu.bu.segrelab.comets.Comets\n"
                 message += "check if comets.version and comets.classpath_pieces['bin'] \n"
                 message += "point to an actual comets.jar file\n"
@@ -544,9 +753,9 @@ class comets:
                 message += ">>> os.environ['COMETS_HOME'] = '/home/comets/'"
                 raise RuntimeError(f"COMETS simulation did not complete:\n {message}")
 
-            loc = self.run_output.find("NoClassDefFoundError")
+            loc = self.run_errors.find("NoClassDefFoundError")
             if loc != -1:
-                error_string = self.run_output[(loc+22):(loc+100)]
+                error_string = self.run_errors[(loc+22):(loc+100)]
                 missing_class = error_string.split("\n")[0]
                 if missing_class[0:6] == "gurobi":
                     message = "JAVA could not find gurobi.\n"
@@ -564,11 +773,12 @@ class comets:
                     message += "with the dependencies installed alongside COMETS"
                 raise RuntimeError(f"COMETS simulation did not complete:\n {message}")
 
-            message = "undetected reason. examine comets.run_output for JAVA trace"
+            message = "undetected reason. examine comets.run_errors for JAVA trace"
             raise RuntimeError(f"COMETS simulation did not complete:\n {message}")
 
 
-    def get_metabolite_image(self, met : str, cycle : int) -> np.array:
+    def get_metabolite_image(self, met : str, cycle : int,
+                             out : np.ndarray = None) -> np.array:
         """
         returns an image of metabolite concentrations at a given cycle
 
@@ -592,6 +802,10 @@ class comets:
             the name of the metabolite
         cycle : int
             the cycle to get the metabolite data
+        out : numpy.ndarray, optional
+            a float array of shape (layout.grid[0], layout.grid[1]) to reuse,
+            e.g. when making images of many cycles. It is zeroed, filled in
+            place and returned.
 
         Returns
         -------
@@ -613,16 +827,23 @@ class comets:
             raise ValueError("media log was not recorded during simulation")
         if met not in list(self.layout.media.metabolite):
             raise NameError("met " + met + " is not in layout.media.metabolite")
-        if cycle not in list(np.unique(self.media['cycle'])):
+        media = self.media
+        # rebuilt if sim.media was replaced, or changed length in place
+        if (self._media_rows is None or self._media_rows[0] is not media
+                or self._media_rows[1] != len(media)):
+            indices = media.groupby(['cycle', 'metabolite'], sort=False,
+                                    observed=True).indices
+            self._media_rows = (media, len(media), indices,
+                                frozenset(c for c, m in indices))
+        _, _, indices, cycles = self._media_rows
+        if cycle not in cycles:
             raise ValueError('media was not saved at the desired cycle. try another.')
-        im = np.zeros((self.layout.grid[0], self.layout.grid[1]))
-        aux = self.media.loc[np.logical_and(self.media['cycle'] == cycle,
-                                            self.media['metabolite'] == met)]
-        for index, row in aux.iterrows():
-            im[int(row['x']-1), int(row['y']-1)] = row['conc_mmol']
+        rows = indices.get((cycle, met), np.array([], dtype=np.intp))
+        im = _log_image(media, rows, 'conc_mmol', self.layout.grid, out)
         return(im)
 
-    def get_biomass_image(self, model_id : str, cycle : int) -> np.array:
+    def get_biomass_image(self, model_id : str, cycle : int,
+                          out : np.ndarray = None) -> np.array:
         """
         returns an image of biomass concentrations at a given cycle
 
@@ -639,6 +860,10 @@ class comets:
             the id of the model to get biomass data on
         cycle : int
             the cycle to get the biomass data
+        out : numpy.ndarray, optional
+            a float array of shape (layout.grid[0], layout.grid[1]) to reuse,
+            e.g. when making images of many cycles. It is zeroed, filled in
+            place and returned.
 
         Returns
         -------
@@ -658,19 +883,34 @@ class comets:
         """
         if not self.parameters.all_params['writeBiomassLog']:
             raise ValueError("biomass log was not recorded during simulation")
-        if model_id not in list(np.unique(self.biomass['species'])):
-            raise NameError("model " + model.id + " is not one of the model ids")
-        if cycle not in list(np.unique(self.biomass['cycle'])):
+        biomass = self.biomass
+        species = biomass['species']
+        # species is categorical when read from the log, but a user may
+        # have assigned a frame with plain strings
+        is_categorical = isinstance(species.dtype, pd.CategoricalDtype)
+        if model_id not in (species.cat.categories if is_categorical
+                            else species.unique()):
+            raise NameError("model " + model_id + " is not one of the model ids")
+        # rebuilt if sim.biomass was replaced, or changed length in place
+        if (self._biomass_rows is None or self._biomass_rows[0] is not biomass
+                or self._biomass_rows[1] != len(biomass)):
+            self._biomass_rows = (biomass, len(biomass),
+                                  biomass.groupby('cycle', sort=False).indices)
+        indices = self._biomass_rows[2]
+        if cycle not in indices:
             raise ValueError('biomass was not saved at the desired cycle. try another.')
-        im = np.zeros((self.layout.grid[0], self.layout.grid[1]))
-        aux = self.biomass.loc[np.logical_and(self.biomass['cycle'] == cycle,
-                                    self.biomass['species'] == model_id), :]
-        for index, row in aux.iterrows():
-            im[int(row['x']-1), int(row['y']-1)] = row['biomass']
+        rows = indices[cycle]
+        if is_categorical:
+            model_code = species.cat.categories.get_loc(model_id)
+            rows = rows[species.cat.codes.to_numpy()[rows] == model_code]
+        else:
+            rows = rows[species.iloc[rows].to_numpy() == model_id]
+        im = _log_image(biomass, rows, 'biomass', self.layout.grid, out)
         return(im)
 
     def get_flux_image(self, model_id : str,
-                       reaction_id : str, cycle : int) -> np.array:
+                       reaction_id : str, cycle : int,
+                       out : np.ndarray = None) -> np.array:
         """
         returns a 2d numpy array showing fluxes at a given cycle
 
@@ -689,6 +929,10 @@ class comets:
             the id of the reaction about which to get fluxes
         cycle : int
             the cycle at which to get fluxes
+        out : numpy.ndarray, optional
+            a float array of shape (layout.grid[0], layout.grid[1]) to reuse,
+            e.g. when making images of many cycles. It is zeroed, filled in
+            place and returned.
 
         Returns
         -------
@@ -710,16 +954,22 @@ class comets:
             raise ValueError("flux log was not recorded during simulation")
         if model_id not in [m.id for m in self.layout.models]:
             raise NameError("model " + model_id + " is not one of the model ids")
-        im = np.zeros((self.layout.grid[0], self.layout.grid[1]))
         temp_fluxes = self.fluxes_by_species[model_id]
-        if cycle not in list(np.unique(temp_fluxes['cycle'])):
+        # fluxes_by_species is a plain dict, so its entries may be replaced
+        # without notice: rebuilt unless built from this same, unchanged frame
+        cached = self._flux_rows.get(model_id)
+        if (cached is None or cached[0] is not temp_fluxes
+                or cached[1] != len(temp_fluxes)):
+            self._flux_rows[model_id] = (temp_fluxes, len(temp_fluxes),
+                                         temp_fluxes.groupby('cycle', sort=False).indices)
+        indices = self._flux_rows[model_id][2]
+        if cycle not in indices:
             raise ValueError('flux was not saved at the desired cycle. try another.')
         if reaction_id not in list(temp_fluxes.columns):
             raise NameError("reaction_id " + reaction_id +
                             " is not a reaction in the desired model")
-        aux = temp_fluxes.loc[temp_fluxes['cycle'] == cycle, :]
-        for index, row in aux.iterrows():
-            im[int(row['x']-1), int(row['y']-1)] = row[reaction_id]
+        rows = indices[cycle]
+        im = _log_image(temp_fluxes, rows, reaction_id, self.layout.grid, out)
         return(im)
 
     def get_metabolite_time_series(self, upper_threshold : float = 1000.) -> pd.DataFrame:
@@ -732,7 +982,7 @@ class comets:
         upper_threshold : float (optional)
             metabolites ever above this are not returned
         """
-        total_media = self.media.groupby(by = ["metabolite", "cycle"]).agg(func = sum).reset_index().drop(columns = ["x", "y"])
+        total_media = self.media.groupby(by = ["metabolite", "cycle"], observed = True).agg(func = sum).reset_index().drop(columns = ["x", "y"])
         total_media = total_media.pivot(columns = "metabolite", values = "conc_mmol", index = ["cycle"]).reset_index().fillna(0.)
         exceeded_threshold = [x for x in total_media.min().index[total_media.min() > upper_threshold] if x != "cycle"]
         total_media = total_media.drop(columns = exceeded_threshold)
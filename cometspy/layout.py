@@ -1427,7 +1427,5 @@ class layout:
         return(met_number)
 
 def _read_file(filename):
-    f = open(filename, 'r')
-    f_lines = f.read()
-    f.close()
-    return f_lines
+    with open(filename, 'r') as f:
+        return f.read()
@@ -1010,7 +1010,5 @@ class model:
 def _read_file(filename: str) -> str:
     """ helper function to read non-rectangular files.
     """
-    f = open(filename, 'r')
-    f_lines = f.read()
-    f.close()
-    return f_lines
+    with open(filename, 'r') as f:
+        return f.read()